@@ -1,156 +1,108 @@
 # /root/xq_poc/app.py  (RECTIFIED)
-import os, json, re, time, sqlite3
-from pathlib import Path
-from textwrap import dedent
+import os, json, re, uuid, sqlite3
 from email.utils import parseaddr
 
 import requests
 import streamlit as st
 
-# --- TRIAL HELPER (inserted automatically) ---
-from datetime import datetime, timezone
-try:
-    import dateutil.parser as _dp
-    _HAS_DATEUTIL = True
-except Exception:
-    _HAS_DATEUTIL = False
-
-def _parse_dt_safe(s):
-    if not s:
-        return None
-    try:
-        if _HAS_DATEUTIL:
-            dt = _dp.isoparse(s)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt
-        else:
-            return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
-    except Exception:
-        return None
-
-def is_trial_active(user_record):
-    """
-    Defensive trial check.
-    Returns (bool active, dict debug)
-    Trial active while BOTH:
-      - account age < 7 days
-      - idea_count < 2
-    """
-    debug = {}
-    idea_count = int(user_record.get("idea_count") or 0)
-    debug['idea_count'] = idea_count
-
-    created_at = user_record.get("created_at")
-    created_dt = _parse_dt_safe(created_at)
-    if created_dt is None:
-        created_dt = datetime.now(timezone.utc)
-        debug['created_at_used'] = 'missing_or_invalid_set_now'
-    else:
-        debug['created_at_used'] = created_at
-
-    now = datetime.now(timezone.utc)
-    delta_days = (now - created_dt).total_seconds() / 86400.0
-    debug['delta_days'] = delta_days
-
-    active = (delta_days < 7.0) and (idea_count < 2)
-    debug['active'] = active
-    return active, debug
-# --- END TRIAL HELPER ---
 # ---------------------------
-# Prompt templates for VET / SHAPE / SCOPE / LAUNCH
-# Insert this AFTER the trial helper and before any call to groq_chat(...)
+# Pipeline core (prompts, Groq wrapper, JSON parsing, PDF) lives in xq_pipeline.py
+# so the job API can run it without a Streamlit script thread.
 # ---------------------------
-from textwrap import dedent
-
-# VET
-VET_SYSTEM = dedent("""\
-You are an expert startup vetting assistant. Your task is to evaluate an idea quickly and produce a compact, factual JSON report suitable for programmatic parsing.
-
-REQUIREMENTS:
-- Output exactly one JSON object inside aetc etc ...
-""")
-
-def VET_USER(industry: str, one_liner: str, desc: str, founder_ctx: str) -> str:
-    prompt = dedent(f"""\
-    Evaluate this startup idea.
-
-    Industry: {industry}
-    One-liner: {one_liner}
-    Description: {desc}
-    Founder context: {founder_ctx}
-
-    Produce the JSON object as specified by the system instructions above.
-    """)
-    return prompt
-
-# SHAPE
-SHAPE_SYSTEM = dedent("""\
-You are an expert product strategist. Given an idea, produce improved one-liner variants and short rationale.
-
-REQUIREMENTS:
-- Return exactly one JSON object etc etc ...
-""")
-
-def SHAPE_USER(one_liner: str, vet_json_str: str) -> str:
-    prompt = dedent(f"""\
-    Original one-liner: {one_liner}
-    VET output: {vet_json_str}
-
-    Generate two improved variants and the fields required by SHAPE_SYSTEM.
-    """)
-    return prompt
-
-# SCOPE
-SCOPE_SYSTEM = dedent("""\
-You are a pragmatic product manager. Produce a concise MVP (30-day) scope.
-
-REQUIREMENTS:
-- Output exactly one JSON object inside a fenced ```json ... ``` block.
-- JSON keys:
-  - etc etc)
-""")
-
-def SCOPE_USER(base_one_liner: str, industry: str, constraints: str) -> str:
-    prompt = dedent(f"""\
-    One-liner to scope: {base_one_liner}
-    Industry: {industry}
-    Constraints: {constraints}
-
-    Produce a 30-day MVP scope per SCOPE_SYSTEM.
-    """)
-    return prompt
-
-# LAUNCH
-LAUNCH_SYSTEM = dedent("""\
-You are a go-to-market operator. Produce a compact launch plan and deck outline.
-
-REQUIREMENTS:
-- Output exactly one JSON object inside a fenced ```json ... ``` block.
-- JSON keys:
-  - ietc etc
-""")
-
-def LAUNCH_USER(one_liner: str, icp_hint: str) -> str:
-    prompt = dedent(f"""\
-    One-liner: {one_liner}
-    ICP hint: {icp_hint}
-
-    Produce the LAUNCH JSON per LAUNCH_SYSTEM.
-    """)
-    return prompt
+from xq_pipeline import (
+    LOGO_PATH, DB_PATH, GroqError, generate_vet_pdf, save_report, is_trial_active, get_user_by_email,
+)
+from xq_router import router
+from xq_trace import (
+    span, traced, start_trace, end_trace, current_trace_id,
+    tracing_enabled, set_tracing_enabled, profiling_every, set_profiling_enabled, should_profile,
+    SamplingProfiler, XQ_TRACE_FILE, XQ_PROFILE_DIR,
+)
 
 # ---------------------------
-# end prompt templates
+# Job API client (optional)
+# When XQ_API_URL is set, stages are submitted to xq_api.py instead of calling Groq from this script thread.
 # ---------------------------
+XQ_API_URL = os.getenv("XQ_API_URL", "").strip().rstrip("/")
+XQ_API_KEY = os.getenv("XQ_API_KEY", "").strip()
+# Draft-then-refine for VET: show the fast model's verdict while the large model finishes (API mode only)
+XQ_VET_DRAFT = os.getenv("XQ_VET_DRAFT", "0") == "1"
+JOB_POLL_SECONDS = 1.0
+
+def _api_headers() -> dict:
+    headers = {"X-XQ-Api-Key": XQ_API_KEY}
+    # Propagate this rerun's trace ID so the worker's spans join the same trace
+    if current_trace_id():
+        headers["X-XQ-Trace-Id"] = current_trace_id()
+    return headers
+
+def api_submit_job(stage: str, inputs: dict, user: dict, draft: bool = False) -> str:
+    try:
+        r = requests.post(f"{XQ_API_URL}/jobs", json={"stage": stage, "inputs": inputs, "user": user, "draft": draft},
+                          headers=_api_headers(), timeout=10)
+    except requests.RequestException as e:
+        raise GroqError(f"Job API unreachable: {e}")
+    if r.status_code != 202:
+        raise GroqError(f"Job API HTTP {r.status_code}: {r.text[:400]}")
+    return r.json()["id"]
+
+def api_get_job(job_id: str) -> dict:
+    try:
+        r = requests.get(f"{XQ_API_URL}/jobs/{job_id}", headers=_api_headers(), timeout=10)
+    except requests.RequestException as e:
+        raise GroqError(f"Job API unreachable: {e}")
+    if r.status_code != 200:
+        raise GroqError(f"Job API HTTP {r.status_code}: {r.text[:400]}")
+    return r.json()
+
+def start_stage(stage: str, inputs: dict) -> tuple[dict | None, str] | None:
+    """
+    Direct mode: run the stage now and return (parsed JSON or None, raw output).
+    API mode: queue a job and return None; take_job_result() hands back the
+    result on a later rerun, so no script thread waits on the LLM.
+    """
+    if XQ_API_URL:
+        with span("api.submit", stage=stage):
+            S["jobs"][stage] = api_submit_job(stage, inputs, S["user"], draft=XQ_VET_DRAFT and stage == "vet")
+        S["job_results"].pop(stage, None)
+        return None
+    data, out, _model = router.run(stage, inputs)
+    if data:
+        # API workers save their own results; in direct mode the UI does it
+        try:
+            save_report(S["user"]["id"], stage, data, industry=inputs.get("industry"))
+        except Exception as e:
+            print("WARNING: failed to save report:", e)
+    return data, out
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_status_panel(stage: str):
+    # Re-runs on its own timer; one non-blocking GET per tick, full rerun once the job settles
+    job_id = S["jobs"].get(stage)
+    if not job_id:
+        return
+    try:
+        job = api_get_job(job_id)
+    except GroqError as e:
+        job = {"status": "failed", "error": str(e)}
+    if job["status"] in ("done", "failed"):
+        S["jobs"].pop(stage, None)
+        S["job_results"][stage] = job
+        st.rerun()
+    elif job["status"] == "draft" and job.get("result"):
+        st.info(f"Preliminary verdict: {job['result'].get('verdict','?')} — refining...")
+    else:
+        st.info(f"{stage.upper()} is running ({job['status']})...")
 
-from dotenv import load_dotenv
-import io
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_LEFT
+def take_job_result(stage: str) -> tuple[dict | None, str] | None:
+    job = S["job_results"].pop(stage, None)
+    if job is None:
+        if S["jobs"].get(stage):
+            job_status_panel(stage)
+        return None
+    if job["status"] == "failed":
+        raise GroqError(job.get("error") or "job failed")
+    return job["result"], job.get("raw") or ""
 
 # --- Project type wording helpers ---
 def get_step_labels(project_type: str):
@@ -184,81 +136,10 @@ def get_step_subheaders(project_type: str):
         "launch": "Pick one channel and get a practical 30–60 day playbook.",
     }
 
-def generate_vet_pdf(user: dict, vet_data: dict, logo_path: str = None) -> bytes:
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
-    styles = getSampleStyleSheet()
-    style_normal = styles["Normal"]
-    style_heading = styles["Heading1"]
-    style_heading.alignment = TA_LEFT
-
-    story = []
-
-    # Add logo if available
-    if logo_path and Path(logo_path).exists():
-        try:
-            story.append(Image(str(logo_path), width=2*inch, height=2*inch))
-            story.append(Spacer(1, 12))
-        except:
-            pass
-
-    # Header
-    story.append(Paragraph("XQ — Investor-Readiness Report", style_heading))
-    story.append(Spacer(1, 12))
-
-    # User info
-    story.append(Paragraph(f"<b>Name:</b> {user['name']}", style_normal))
-    story.append(Paragraph(f"<b>Email:</b> {user['email']}", style_normal))
-    story.append(Paragraph(f"<b>Phone:</b> {user['phone']}", style_normal))
-    story.append(Spacer(1, 12))
-
-    # Verdict
-    story.append(Paragraph(f"<b>Verdict:</b> {vet_data.get('verdict', '-')}", style_normal))
-    story.append(Spacer(1, 12))
-
-    # Summary
-    story.append(Paragraph("<b>Summary:</b>", style_normal))
-    story.append(Paragraph(vet_data.get("summary", "—"), style_normal))
-    story.append(Spacer(1, 12))
-
-    # Scores
-    story.append(Paragraph("<b>Scores:</b>", style_normal))
-    for k, v in vet_data.get("scores", {}).items():
-        story.append(Paragraph(f"{k.replace('_',' ').title()}: {v}", style_normal))
-    story.append(Spacer(1, 12))
-
-    # Top Risks
-    story.append(Paragraph("<b>Top Risks:</b>", style_normal))
-    for item in vet_data.get("top_risks", []):
-        story.append(Paragraph(f"• {item}", style_normal))
-    story.append(Spacer(1, 12))
-
-    # Must Fix
-    story.append(Paragraph("<b>Must Fix:</b>", style_normal))
-    for item in vet_data.get("must_fix", []):
-        story.append(Paragraph(f"• {item}", style_normal))
-
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    return pdf
-
-# ---------------------------
-# ENV & CONFIG
-# ---------------------------
-BASE_DIR = Path(__file__).parent
-ASSETS_DIR = BASE_DIR / "assets"
-LOGO_PATH = ASSETS_DIR / "xq_logo.png"  # change if needed
-DB_PATH = BASE_DIR / "xq.db"
-
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
-GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-
 # ---------------------------
 # DB (self-contained)
 # ---------------------------
+@traced("db.init")
 def db_init():
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     with sqlite3.connect(DB_PATH) as con:
@@ -272,6 +153,7 @@ def db_init():
         )""")
         con.commit()
 
+@traced("db.upsert_user")
 def db_upsert_user(name: str, email: str, phone: str) -> dict:
     with sqlite3.connect(DB_PATH) as con:
         cur = con.cursor()
@@ -310,85 +192,13 @@ def db_upsert_user(name: str, email: str, phone: str) -> dict:
             "idea_count": user_row[5]
         }
 
+@traced("db.get_user_by_email")
 def db_get_user_by_email(email: str) -> dict | None:
-    with sqlite3.connect(DB_PATH) as con:
-        cur = con.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL UNIQUE,
-                phone TEXT,
-                created_at TEXT DEFAULT (datetime('now')),
-                idea_count INTEGER DEFAULT 0
-            )
-        """)
-        con.commit()
-
-        cur.execute("SELECT id, name, email, phone, created_at, idea_count FROM users WHERE email=?", (email,))
-        row = cur.fetchone()
-        if row:
-            return {
-                "id": row[0],
-                "name": row[1],
-                "email": row[2],
-                "phone": row[3],
-                "created_at": row[4],
-                "idea_count": row[5]
-            }
-        return None
-
-# ---------------------------
-# LLM (Groq) minimal wrapper
-# ---------------------------
-class GroqError(Exception): ...
-
-def groq_chat(messages, model: str = GROQ_MODEL, temperature: float = 0.2, max_tokens: int = 900, retries: int = 3, timeout: int = 30) -> str:
-    if not GROQ_API_KEY:
-        raise GroqError("GROQ_API_KEY missing. Add it to .env or environment.")
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-    }
-    last_err = None
-    for attempt in range(1, retries + 1):
-        try:
-            r = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(payload), timeout=timeout)
-            if r.status_code == 200:
-                data = r.json()
-                return data["choices"][0]["message"]["content"]
-            last_err = GroqError(f"HTTP {r.status_code}: {r.text[:400]}")
-        except requests.RequestException as e:
-            last_err = e
-        time.sleep(1.5 * attempt)
-    raise GroqError(f"Groq chat failed after {retries} tries: {last_err}")
+    return get_user_by_email(email)
 
 # ---------------------------
 # Helpers
 # ---------------------------
-def extract_json_block(text: str):
-    if not text:
-        return None
-    fence = re.search(r"""```json\s*(\{.*?\})\s*```""", text, flags=re.S|re.M)
-    if fence:
-        try:
-            return json.loads(fence.group(1))
-        except json.JSONDecodeError:
-            pass
-    brace = re.search(r"(\{.*\})", text, flags=re.S)
-    if brace:
-        try:
-            return json.loads(brace.group(1))
-        except json.JSONDecodeError:
-            return None
-    return None
-
 def clean_input(text: str) -> str:
     return (text or '').strip().replace('\u200b', '').replace('\xa0', '').replace('\u200c', '')
 
@@ -410,6 +220,7 @@ def valid_phone(p: str) -> bool:
 # ---------------------------
 # Trial Limit Helpers (updated)
 # ---------------------------
+@traced("db.increment_idea_count")
 def increment_idea_count(user_id: int):
     with sqlite3.connect(DB_PATH) as con:
         cur = con.cursor()
@@ -420,6 +231,22 @@ def increment_idea_count(user_id: int):
 # UI
 # ---------------------------
 st.set_page_config(page_title="XQ – Don't build. Think.", page_icon="XQ", layout="wide")
+
+# --- Per-rerun trace + admin-toggled sampling profiler (both process-wide) ---
+def close_rerun_instrumentation(aborted: bool):
+    prof = st.session_state.pop("_xq_profiler", None)
+    trace = st.session_state.pop("_xq_trace", None)
+    if prof is not None:
+        prof.stop()
+        prof.save(f"rerun-{trace.trace_id if trace else uuid.uuid4().hex[:16]}")
+    end_trace(trace, aborted=aborted)
+
+# A rerun cut short by st.rerun()/st.stop() never reaches the bottom of the script; close it here
+close_rerun_instrumentation(aborted=True)
+st.session_state["_xq_trace"] = start_trace("rerun")
+if should_profile():
+    st.session_state["_xq_profiler"] = SamplingProfiler().start()
+
 db_init()
 
 # Header / Top bar with logo + tagline
@@ -449,6 +276,8 @@ if "state" not in st.session_state:
         "launch_json": None,
         "project_type": None,  # "tech" or "consumer"
         "user": {"id": None, "name": "", "email": "", "phone": ""},
+        "jobs": {},          # stage -> pending job id (API mode)
+        "job_results": {},   # stage -> settled job, consumed by take_job_result
     }
 S = st.session_state.state
 
@@ -538,7 +367,8 @@ def render_sidebar():
         # keep sidebar visible and show any error *inside* the sidebar
         st.sidebar.error(f"Sidebar error: {e!s}")
 
-render_sidebar()
+with span("ui.sidebar"):
+    render_sidebar()
 
 # Tabs
 disabled_tabs = not bool(S["user"]["id"])
@@ -553,7 +383,7 @@ tab1, tab2, tab3, tab4 = st.tabs([
 
 
 # --- VET ---
-with tab1:    
+with tab1, span("ui.vet"):    
     if disabled_tabs:
         st.info("Unlock by saving your details in the left panel.")
     else:
@@ -579,23 +409,27 @@ with tab1:
         else:
             # Visible hint + explicit CTA
             st.info("Tip: Press Ctrl+Enter to submit, or click the blue **Run VET** button below.")
-            if st.button("Run VET", type="primary"):
-                try:
-                    messages = [
-                        {"role": "system", "content": VET_SYSTEM},
-                        {"role": "user", "content": VET_USER(S["industry"], S["one_liner"], S["desc"], S["founder_ctx"])},
-                    ]
-                    out = groq_chat(messages, temperature=0.15, max_tokens=900)
-                    data = extract_json_block(out)
+            try:
+                result = None
+                if st.button("Run VET", type="primary"):
+                    result = start_stage("vet", {
+                        "industry": S["industry"], "one_liner": S["one_liner"],
+                        "desc": S["desc"], "founder_ctx": S["founder_ctx"],
+                    })
+                result = result or take_job_result("vet")
+                if result:
+                    data, out = result
                     if not data:
                         st.warning("Could not parse JSON. Showing raw output:")
                         st.code(out)
                     else:
                        # success: increment idea_count AFTER successful response
-                       try:
-                           increment_idea_count(S["user"]["id"])
-                       except Exception as e:
-                           print("WARNING: failed to increment idea_count:", e)
+                       # (in API mode the server already counted it when the job was queued)
+                       if not XQ_API_URL:
+                           try:
+                               increment_idea_count(S["user"]["id"])
+                           except Exception as e:
+                               print("WARNING: failed to increment idea_count:", e)
 
                        S["vet_json"] = data
                        pdf_bytes = generate_vet_pdf(S["user"], S["vet_json"], logo_path=str(LOGO_PATH))
@@ -617,11 +451,11 @@ with tab1:
                        st.write("**Must Fix**")
                        st.write(data.get("must_fix", []))
 
-                except GroqError as e:
-                    st.error(f"Groq error: {e}")
+            except GroqError as e:
+                st.error(f"Groq error: {e}")
 
 # --- SHAPE ---
-with tab2:
+with tab2, span("ui.shape"):
     if disabled_tabs:
         st.info("Unlock by saving your details in the left panel.")
     else:
@@ -632,14 +466,13 @@ with tab2:
         if not S["vet_json"]:
             st.info("Run VET first to enable SHAPE.")
         else:
-            if st.button("Generate 2 improved variants"):
-              try:
-                messages = [
-                    {"role": "system", "content": SHAPE_SYSTEM},
-                    {"role": "user", "content": SHAPE_USER(S["one_liner"], json.dumps(S["vet_json"]))},
-                ]
-                out = groq_chat(messages, temperature=0.25, max_tokens=1000)
-                data = extract_json_block(out)
+            try:
+              result = None
+              if st.button("Generate 2 improved variants"):
+                result = start_stage("shape", {"one_liner": S["one_liner"], "vet_json_str": json.dumps(S["vet_json"])})
+              result = result or take_job_result("shape")
+              if result:
+                data, out = result
                 if not data:
                     st.warning("Could not parse JSON. Showing raw output:")
                     st.code(out)
@@ -647,8 +480,8 @@ with tab2:
                     S["shape_json"] = data
                     pdf_bytes = generate_vet_pdf(S["user"], S["shape_json"], logo_path=str(LOGO_PATH))
                     st.download_button("📄 Download SHAPE Report (PDF)", data=pdf_bytes, file_name="xq_shape_report.pdf", mime="application/pdf")
-              except GroqError as e:
-                st.error(f"Groq error: {e}")
+            except GroqError as e:
+              st.error(f"Groq error: {e}")
         if not S["vet_json"]:
             st.info("Run VET first to enable SHAPE.")
 
@@ -666,7 +499,7 @@ with tab2:
                     st.success(f"Chosen: {S['chosen_variant']}")
 
 # --- SCOPE ---
-with tab3:
+with tab3, span("ui.scope"):
     if disabled_tabs:
         st.info("Unlock by saving your details in the left panel.")
     else:
@@ -674,14 +507,13 @@ with tab3:
         st.markdown(f"#### {_sub['scope']}")
         base_one_liner = S["chosen_variant"] or S["one_liner"]
         constraints = st.text_input("Constraints (team size, capital, city/tier)", value=S["founder_ctx"])
-        if st.button("Generate MVP scope"):
-            try:
-                messages = [
-                    {"role": "system", "content": SCOPE_SYSTEM},
-                    {"role": "user", "content": SCOPE_USER(base_one_liner, S["industry"], constraints)},
-                ]
-                out = groq_chat(messages, temperature=0.2, max_tokens=900)
-                data = extract_json_block(out)
+        try:
+            result = None
+            if st.button("Generate MVP scope"):
+                result = start_stage("scope", {"base_one_liner": base_one_liner, "industry": S["industry"], "constraints": constraints})
+            result = result or take_job_result("scope")
+            if result:
+                data, out = result
                 if not data:
                     st.warning("Could not parse JSON. Showing raw output:")
                     st.code(out)
@@ -689,8 +521,8 @@ with tab3:
                     S["scope_json"] = data
                     pdf_bytes = generate_vet_pdf(S["user"], S["scope_json"], logo_path=str(LOGO_PATH))
                     st.download_button("📄 Download SCOPE Report (PDF)", data=pdf_bytes, file_name="xq_scope_report.pdf", mime="application/pdf")
-            except GroqError as e:
-                st.error(f"Groq error: {e}")
+        except GroqError as e:
+            st.error(f"Groq error: {e}")
 
         if S.get("scope_json"):
             st.write("**Must build**")
@@ -705,22 +537,21 @@ with tab3:
             st.write(S["scope_json"].get("quick_validation", []))
 
 # --- LAUNCH ---
-with tab4:
+with tab4, span("ui.launch"):
     if disabled_tabs:
         st.info("Unlock by saving your details in the left panel.")
     else:
         st.subheader("LAUNCH — 30–60 Day Compass")
         st.markdown(f"#### {_sub['launch']}")
         icp_hint = st.text_input("ICP hint (optional, e.g., Tier-2 SME owners, delivery partners, etc.)", "")
-        if st.button("Generate plan"):
-            try:
+        try:
+            result = None
+            if st.button("Generate plan"):
                 one = S["chosen_variant"] or S["one_liner"]
-                messages = [
-                    {"role": "system", "content": LAUNCH_SYSTEM},
-                    {"role": "user", "content": LAUNCH_USER(one, icp_hint)},
-                ]
-                out = groq_chat(messages, temperature=0.25, max_tokens=1100)
-                data = extract_json_block(out)
+                result = start_stage("launch", {"one_liner": one, "icp_hint": icp_hint})
+            result = result or take_job_result("launch")
+            if result:
+                data, out = result
                 if not data:
                     st.warning("Could not parse JSON. Showing raw output:")
                     st.code(out)
@@ -728,8 +559,8 @@ with tab4:
                     S["launch_json"] = data
                     pdf_bytes = generate_vet_pdf(S["user"], S["launch_json"], logo_path=str(LOGO_PATH))
                     st.download_button("📄 Download LAUNCH Plan (PDF)", data=pdf_bytes, file_name="xq_launch_plan.pdf", mime="application/pdf")
-            except GroqError as e:
-                st.error(f"Groq error: {e}")
+        except GroqError as e:
+            st.error(f"Groq error: {e}")
 
         if S.get("launch_json"):
             st.write("**ICP summary**")
@@ -751,7 +582,7 @@ st.caption(" XQ — Don’t build. Think. | Free 7-day trial. If it helps, pleas
 # ---------------------------
 if "admin" in st.query_params and st.query_params["admin"] == "xq106":
     st.title("🛡️ Admin Panel – XQ Users")
-    with sqlite3.connect(DB_PATH) as con:
+    with span("db.admin_users"), sqlite3.connect(DB_PATH) as con:
         cur = con.cursor()
         cur.execute("SELECT name, email, phone, created_at, idea_count FROM users ORDER BY created_at DESC")
         rows = cur.fetchall()
@@ -764,3 +595,42 @@ if "admin" in st.query_params and st.query_params["admin"] == "xq106":
         st.download_button("📥 Download User List (CSV)", data=csv, file_name="xq_users.csv", mime="text/csv")
     else:
         st.info("No users found.")
+
+    st.subheader("Bulk export (reports + user data)")
+    ex1, ex2, ex3, ex4 = st.columns(4)
+    ex_cohort = ex1.text_input("Signup cohort (YYYY-MM)", "")
+    ex_since = ex2.text_input("Reports since (YYYY-MM-DD)", "")
+    ex_until = ex3.text_input("Reports until (YYYY-MM-DD)", "")
+    ex_industry = ex4.text_input("Industry", "")
+    ex_filters = {k: v.strip() for k, v in
+                  {"cohort": ex_cohort, "since": ex_since, "until": ex_until, "industry": ex_industry}.items() if v.strip()}
+    # Streamed by the API / CLI so the archive never sits in this script's memory.
+    # The admin key stays in the operator's shell, never in the rendered page.
+    if XQ_API_URL:
+        from urllib.parse import urlencode
+        st.code(
+            f'curl -fo xq_export.zip -H "X-XQ-Admin-Key: $XQ_ADMIN_KEY" '
+            f'"{XQ_API_URL}/admin/export.zip?{urlencode(ex_filters)}"'
+        )
+        st.caption("Each download is one part. While its export.json says \"more\": true, "
+                   "repeat with &after_id=<last_report_id> for the next part.")
+    else:
+        cli_args = " ".join(f'--{k} "{v}"' for k, v in ex_filters.items())
+        st.code(f"python scripts/xq_export.py xq_export.zip {cli_args}".strip())
+
+    st.subheader("Diagnostics")
+    trace_on = st.checkbox(
+        "Trace reruns (this app process)", value=tracing_enabled(),
+        help="API workers read XQ_TRACE at startup; jobs submitted from a traced rerun are traced regardless.",
+    )
+    if trace_on != tracing_enabled():
+        set_tracing_enabled(trace_on)
+    # Process-wide, like tracing: catches the slow reruns of the founder who reported them
+    pr1, pr2 = st.columns([3, 1])
+    profile_on = pr1.checkbox("Sampling profiler (all sessions in this app process)", value=profiling_every() > 0)
+    profile_every = pr2.number_input("every Nth rerun", min_value=1, value=max(1, profiling_every()), step=1)
+    if (profile_every if profile_on else 0) != profiling_every():
+        set_profiling_enabled(profile_on, every=profile_every)
+    st.caption(f"Traces: {XQ_TRACE_FILE} · Profiles (folded stacks, open in speedscope.app): {XQ_PROFILE_DIR}")
+
+close_rerun_instrumentation(aborted=False)
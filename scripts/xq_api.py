@@ -0,0 +1,351 @@
+# xq_api.py
+# Async job API for the VET / SHAPE / SCOPE / LAUNCH pipeline.
+#
+#   XQ_API_KEY=... python xq_api.py       # API + in-process worker pool on 127.0.0.1:8600
+#   python xq_api.py --workers-only       # extra worker tier on the same xq.db
+#
+# Jobs live in a persistent SQLite table, so the UI, the API and any number of
+# worker processes can share one queue. Point the Streamlit app at it with
+# XQ_API_URL=http://localhost:8600 and the same XQ_API_KEY.
+import os, json, uuid, hmac, asyncio, sqlite3, argparse
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from xq_pipeline import (
+    DB_PATH, LOGO_PATH, STAGES, GroqError, build_messages, generate_vet_pdf, save_report,
+    get_user_by_email, claim_trial_idea, refund_trial_idea,
+)
+from xq_router import router
+from xq_trace import start_trace, end_trace
+from xq_export import EXPORT_PART_SIZE, stream_export_zip
+
+XQ_API_WORKERS = int(os.getenv("XQ_API_WORKERS", "4"))
+XQ_API_KEY = os.getenv("XQ_API_KEY", "").strip()
+JOB_POLL_SECONDS = 0.5
+STALE_RUNNING_MINUTES = 10
+XQ_ADMIN_KEY = os.getenv("XQ_ADMIN_KEY", "").strip()     # unset: /admin/* is disabled
+FINAL_STATUSES = ("done", "failed")
+
+# ---------------------------
+# Job table
+# ---------------------------
+def jobs_init():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        # WAL lets the UI, the API and worker processes read while a worker writes
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                inputs TEXT NOT NULL,
+                user TEXT,
+                result TEXT,
+                raw TEXT,
+                error TEXT,
+                model TEXT,
+                draft INTEGER DEFAULT 0,
+                trace_id TEXT,
+                created_at TEXT DEFAULT (datetime('now')),
+                updated_at TEXT DEFAULT (datetime('now'))
+            )
+        """)
+        # Columns added after the first release of the table
+        cols = {c[1] for c in cur.execute("PRAGMA table_info(jobs)")}
+        for col, decl in (("model", "TEXT"), ("draft", "INTEGER DEFAULT 0"), ("trace_id", "TEXT")):
+            if col not in cols:
+                cur.execute(f"ALTER TABLE jobs ADD COLUMN {col} {decl}")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        # Re-queue jobs left 'running' by a worker that died mid-call
+        cur.execute(
+            "UPDATE jobs SET status='queued' WHERE status IN ('running', 'draft') AND updated_at < datetime('now', ?)",
+            (f"-{STALE_RUNNING_MINUTES} minutes",),
+        )
+        con.commit()
+
+def _job_row_to_dict(row) -> dict:
+    return {
+        "id": row[0],
+        "stage": row[1],
+        "status": row[2],
+        "inputs": json.loads(row[3]),
+        "user": json.loads(row[4]) if row[4] else {},
+        "result": json.loads(row[5]) if row[5] else None,
+        "raw": row[6],
+        "error": row[7],
+        "created_at": row[8],
+        "updated_at": row[9],
+        "model": row[10],
+        "draft": bool(row[11]),
+        "trace_id": row[12],
+    }
+
+def job_create(stage: str, inputs: dict, user: dict, draft: bool = False, trace_id: str | None = None) -> str:
+    job_id = uuid.uuid4().hex
+    with sqlite3.connect(DB_PATH) as con:
+        con.execute(
+            "INSERT INTO jobs(id, stage, inputs, user, draft, trace_id) VALUES (?,?,?,?,?,?)",
+            (job_id, stage, json.dumps(inputs), json.dumps(user), int(draft), trace_id),
+        )
+        con.commit()
+    return job_id
+
+def job_get(job_id: str) -> dict | None:
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        cur.execute(
+            "SELECT id, stage, status, inputs, user, result, raw, error, created_at, updated_at, model, draft, trace_id "
+            "FROM jobs WHERE id=?",
+            (job_id,),
+        )
+        row = cur.fetchone()
+    return _job_row_to_dict(row) if row else None
+
+def job_claim() -> dict | None:
+    """
+    Atomically move the oldest queued job to 'running' and return it.
+    BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same job.
+    """
+    con = sqlite3.connect(DB_PATH, isolation_level=None, timeout=30)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        row = con.execute("SELECT id FROM jobs WHERE status='queued' ORDER BY created_at, rowid LIMIT 1").fetchone()
+        if row:
+            con.execute("UPDATE jobs SET status='running', updated_at=datetime('now') WHERE id=?", (row[0],))
+        con.execute("COMMIT")
+    finally:
+        con.close()
+    return job_get(row[0]) if row else None
+
+def job_finish(job_id: str, result: dict | None, raw: str | None, error: str | None = None, model: str | None = None):
+    with sqlite3.connect(DB_PATH) as con:
+        con.execute(
+            "UPDATE jobs SET status=?, result=?, raw=?, error=?, model=?, updated_at=datetime('now') WHERE id=?",
+            ("failed" if error else "done", json.dumps(result) if result is not None else None, raw, error, model, job_id),
+        )
+        con.commit()
+
+def job_set_draft(job_id: str, result: dict, raw: str, model: str):
+    # Preliminary result from the fast model; job_finish overwrites it with the refined one
+    with sqlite3.connect(DB_PATH) as con:
+        con.execute(
+            "UPDATE jobs SET status='draft', result=?, raw=?, model=?, updated_at=datetime('now') WHERE id=? AND status='running'",
+            (json.dumps(result), raw, model, job_id),
+        )
+        con.commit()
+
+def job_queue_depth() -> int:
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        cur.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running', 'draft')")
+        return cur.fetchone()[0]
+
+# ---------------------------
+# Worker pool
+# ---------------------------
+_wakeup: asyncio.Event | None = None
+
+async def _draft_pass(job: dict):
+    # Fast-model preview; job_set_draft only lands while the job is still running
+    fast = router.fast_model(job["stage"])
+    try:
+        data, raw, _ = await asyncio.to_thread(router.run, job["stage"], job["inputs"], model=fast)
+        if data:
+            await asyncio.to_thread(job_set_draft, job["id"], data, raw, fast)
+    except Exception as e:
+        print("WARNING: draft pass failed:", e)
+
+async def run_job(job: dict):
+    # A trace ID means the submitting rerun was traced: trace the job too, whatever
+    # XQ_TRACE says in this process, and reuse the ID so UI and worker spans line up
+    trace = start_trace(f"job.{job['stage']}", trace_id=job["trace_id"], force=bool(job["trace_id"]))
+    # Draft and refine run side by side, so the refined result is not delayed by the draft
+    draft_task = asyncio.create_task(_draft_pass(job)) if job["draft"] else None
+    succeeded = False
+    try:
+        # groq_chat is blocking (requests + retry sleeps); keep it off the event loop
+        depth = await asyncio.to_thread(job_queue_depth)
+        # A draft job already has a fast answer coming; the refine pass must use the large model
+        model = router.large_model(job["stage"]) if job["draft"] else None
+        data, raw, model = await asyncio.to_thread(router.run, job["stage"], job["inputs"], depth, model)
+        await asyncio.to_thread(job_finish, job["id"], data, raw, None, model)
+        succeeded = data is not None
+        if data:
+            try:
+                await asyncio.to_thread(save_report, job["user"].get("id"), job["stage"], data, job["inputs"].get("industry"))
+            except sqlite3.Error as e:
+                print("WARNING: failed to save report:", e)
+    except GroqError as e:
+        await asyncio.to_thread(job_finish, job["id"], None, None, f"Groq error: {e}")
+    except Exception as e:
+        await asyncio.to_thread(job_finish, job["id"], None, None, f"{type(e).__name__}: {e}")
+    finally:
+        if draft_task is not None:
+            await draft_task
+        end_trace(trace, job_id=job["id"])
+    # Not in `finally`: a cancelled job is re-queued on restart and still holds its claim
+    if job["stage"] == "vet" and not succeeded:
+        try:
+            await asyncio.to_thread(refund_trial_idea, job["user"]["id"])
+        except sqlite3.Error as e:
+            print("WARNING: failed to refund trial idea:", e)
+
+async def worker_loop():
+    while True:
+        _wakeup.clear()
+        job = await asyncio.to_thread(job_claim)
+        if job is None:
+            # Woken early by submit_job in this process; other processes are picked up on the poll
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_SECONDS * 4)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await run_job(job)
+
+def start_workers(n: int) -> list:
+    global _wakeup
+    _wakeup = asyncio.Event()
+    return [asyncio.create_task(worker_loop()) for _ in range(n)]
+
+# ---------------------------
+# HTTP API
+# ---------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not XQ_API_KEY:
+        raise RuntimeError("XQ_API_KEY is not set; refusing to serve an unauthenticated job API")
+    jobs_init()
+    workers = start_workers(XQ_API_WORKERS)
+    yield
+    for w in workers:
+        w.cancel()
+
+app = FastAPI(title="XQ Job API", lifespan=lifespan)
+
+def require_api_key(x_xq_api_key: str | None = Header(default=None)):
+    if not XQ_API_KEY or not x_xq_api_key or not hmac.compare_digest(x_xq_api_key, XQ_API_KEY):
+        raise HTTPException(401, "Missing or invalid X-XQ-Api-Key")
+
+def require_admin_key(x_xq_admin_key: str | None = Header(default=None)):
+    if not XQ_ADMIN_KEY:
+        raise HTTPException(503, "Admin endpoints are disabled (XQ_ADMIN_KEY is not set)")
+    if not x_xq_admin_key or not hmac.compare_digest(x_xq_admin_key, XQ_ADMIN_KEY):
+        raise HTTPException(401, "Missing or invalid X-XQ-Admin-Key")
+
+class JobIn(BaseModel):
+    stage: str
+    inputs: dict
+    user: dict = {}
+    draft: bool = False     # fast-model preliminary result first, large-model result replaces it
+
+@app.post("/jobs", status_code=202, dependencies=[Depends(require_api_key)])
+async def submit_job(body: JobIn, x_xq_trace_id: str | None = Header(default=None)):
+    if body.stage not in STAGES:
+        raise HTTPException(400, f"Unknown stage '{body.stage}'. Expected one of: {', '.join(STAGES)}")
+    try:
+        build_messages(body.stage, body.inputs)
+    except TypeError as e:
+        raise HTTPException(422, f"Bad inputs for {body.stage}: {e}")
+    # Trust only the server's user record, never the client's copy
+    user = await asyncio.to_thread(get_user_by_email, body.user.get("email", ""))
+    if user is None:
+        raise HTTPException(403, "Unknown user. Register in the app first.")
+    # Same gate as the VET tab. The idea is claimed when queued, so concurrent submits
+    # cannot overrun the limit, and run_job refunds it if the job yields no report
+    if body.stage == "vet" and not await asyncio.to_thread(claim_trial_idea, user):
+        raise HTTPException(403, "Your free trial is over (7 days or 2 ideas).")
+    job_id = await asyncio.to_thread(job_create, body.stage, body.inputs, user, body.draft, x_xq_trace_id)
+    if _wakeup is not None:
+        _wakeup.set()
+    return {"id": job_id, "status": "queued"}
+
+async def _get_job_or_404(job_id: str) -> dict:
+    job = await asyncio.to_thread(job_get, job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(require_api_key)])
+async def poll_job(job_id: str):
+    return await _get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/events", dependencies=[Depends(require_api_key)])
+async def job_events(job_id: str):
+    await _get_job_or_404(job_id)
+
+    async def stream():
+        last = None
+        while True:
+            job = await asyncio.to_thread(job_get, job_id)
+            state = (job["status"], job["updated_at"])
+            if state != last:
+                last = state
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            if job["status"] in FINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}/pdf", dependencies=[Depends(require_api_key)])
+async def job_pdf(job_id: str):
+    job = await _get_job_or_404(job_id)
+    if job["status"] != "done" or not job["result"]:
+        raise HTTPException(409, f"No report yet (status: {job['status']})")
+    user = {"name": "", "email": "", "phone": "", **job["user"]}
+    pdf = await asyncio.to_thread(generate_vet_pdf, user, job["result"], str(LOGO_PATH))
+    return Response(
+        pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="xq_{job["stage"]}_report.pdf"'},
+    )
+
+@app.get("/router", dependencies=[Depends(require_api_key)])
+async def router_stats():
+    # Read from xq.db, so it covers --workers-only processes too
+    return await asyncio.to_thread(router.snapshot)
+
+@app.get("/admin/export.zip", dependencies=[Depends(require_admin_key)])
+def export_zip(cohort: str | None = None, since: str | None = None, until: str | None = None,
+               industry: str | None = None, after_id: int = 0, limit: int = EXPORT_PART_SIZE):
+    # Sync generator: Starlette iterates it in a threadpool, one ZIP entry at a time.
+    # Always one bounded part (zipfile holds a ZipInfo per entry until the end); fetch
+    # the next from export.json's last_report_id while `more` is true.
+    if not 1 <= limit <= EXPORT_PART_SIZE:
+        raise HTTPException(422, f"limit must be between 1 and {EXPORT_PART_SIZE}")
+    chunks = stream_export_zip(cohort=cohort, since=since, until=until, industry=industry,
+                               after_id=after_id, limit=limit)
+    name = f"xq_export_from_{after_id}.zip" if after_id else "xq_export.zip"
+    return StreamingResponse(chunks, media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True, "queue_depth": await asyncio.to_thread(job_queue_depth)}
+
+# ---------------------------
+# Standalone worker tier
+# ---------------------------
+async def _workers_only(n: int):
+    jobs_init()
+    await asyncio.gather(*start_workers(n))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XQ job workers")
+    parser.add_argument("--workers-only", action="store_true", help="run workers without the HTTP API")
+    parser.add_argument("--workers", type=int, default=XQ_API_WORKERS)
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (put a TLS proxy in front before exposing it)")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    XQ_API_WORKERS = args.workers
+    if args.workers_only:
+        asyncio.run(_workers_only(args.workers))
+    else:
+        import uvicorn
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,275 @@
+# xq_export.py
+# Streaming bulk export of founders' reports as a ZIP archive.
+#
+#   python xq_export.py xq_export.zip --cohort 2025-09 --industry "SaaS / IT"
+#       -> xq_export.part001.zip, xq_export.part002.zip, ... (--part-size reports each)
+#   python xq_export.py xq_export.zip --resume-from xq_export.zip.checkpoint
+#   GET /admin/export.zip?since=2025-09-01&after_id=0   X-XQ-Admin-Key: ...   (xq_api.py, one part per call)
+#
+# Archive layout (one part):
+#   users.jsonl                                    founders matching the filters (first part only)
+#   founders/<user_id>_<email>/<report_id>_<stage>.pdf
+#   founders/<user_id>_<email>/<report_id>_<stage>.json
+#   manifest.jsonl                                 one line per report in this part
+#   export.json                                    filters, part, after_id, count, last_report_id, more
+#
+# Every part is a complete archive. The next part starts after export.json's
+# last_report_id while `more` is true; the CLI checkpoints only at part
+# boundaries, so a resumed export rewrites just the part that was interrupted.
+#
+# Memory stays flat: reports are read in keyset pages, each ZIP entry is flushed
+# to the consumer as soon as it is written, the manifest is spooled to a temp
+# file, and at most `2 x workers` PDFs are in flight at once. zipfile still keeps
+# one ZipInfo per entry until the archive closes, which is why exports are cut
+# into parts (the API always serves one part; the CLI's --part-size 0 opts out).
+import os, re, json, sqlite3, zipfile, tempfile, argparse, shutil, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from xq_pipeline import DB_PATH, LOGO_PATH, generate_vet_pdf, report_pdf_path, users_init, reports_init
+
+EXPORT_PAGE_SIZE = 200
+EXPORT_PART_SIZE = 500      # reports per archive part (CLI default)
+
+# ---------------------------
+# Query
+# ---------------------------
+def _tables_init():
+    # A fresh DB has neither table yet; an export of it is simply empty
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        users_init(cur)
+        reports_init(cur)
+        con.commit()
+
+def _filter_sql(cohort: str = None, since: str = None, until: str = None, industry: str = None) -> tuple[str, list]:
+    where, args = [], []
+    if cohort:      # signup month, YYYY-MM
+        where.append("strftime('%Y-%m', u.created_at) = ?")
+        args.append(cohort)
+    if since:
+        where.append("r.created_at >= ?")
+        args.append(since)
+    if until:       # inclusive date
+        where.append("r.created_at < date(?, '+1 day')")
+        args.append(until)
+    if industry:    # founder has at least one report in this industry
+        where.append("r.user_id IN (SELECT user_id FROM reports WHERE industry = ?)")
+        args.append(industry)
+    return (" AND " + " AND ".join(where)) if where else "", args
+
+def iter_reports(cohort=None, since=None, until=None, industry=None, after_id: int = 0, page_size: int = EXPORT_PAGE_SIZE):
+    _tables_init()
+    extra, args = _filter_sql(cohort, since, until, industry)
+    last_id = after_id
+    while True:
+        with sqlite3.connect(DB_PATH) as con:
+            cur = con.cursor()
+            cur.execute(
+                "SELECT r.id, r.user_id, r.stage, r.industry, r.data, r.created_at, u.name, u.email, u.phone, u.created_at "
+                "FROM reports r JOIN users u ON u.id = r.user_id "
+                f"WHERE r.id > ?{extra} ORDER BY r.id LIMIT ?",
+                [last_id, *args, page_size],
+            )
+            rows = cur.fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield {
+                "report_id": row[0],
+                "user_id": row[1],
+                "stage": row[2],
+                "industry": row[3],
+                "data": json.loads(row[4]),
+                "created_at": row[5],
+                "user": {"name": row[6], "email": row[7], "phone": row[8], "created_at": row[9]},
+            }
+        last_id = rows[-1][0]
+
+def has_reports_after(report_id: int, cohort=None, since=None, until=None, industry=None) -> bool:
+    extra, args = _filter_sql(cohort, since, until, industry)
+    with sqlite3.connect(DB_PATH) as con:
+        row = con.execute(
+            f"SELECT 1 FROM reports r JOIN users u ON u.id = r.user_id WHERE r.id > ?{extra} LIMIT 1",
+            [report_id, *args],
+        ).fetchone()
+    return row is not None
+
+def iter_users(cohort=None, industry=None):
+    _tables_init()
+    where, args = [], []
+    if cohort:
+        where.append("strftime('%Y-%m', created_at) = ?")
+        args.append(cohort)
+    if industry:
+        where.append("id IN (SELECT user_id FROM reports WHERE industry = ?)")
+        args.append(industry)
+    sql = "SELECT id, name, email, phone, created_at, idea_count FROM users"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with sqlite3.connect(DB_PATH) as con:
+        for row in con.execute(sql + " ORDER BY id", args):
+            yield {"id": row[0], "name": row[1], "email": row[2], "phone": row[3], "created_at": row[4], "idea_count": row[5]}
+
+# ---------------------------
+# Rendering (parallel, bounded)
+# ---------------------------
+def render_report_pdf(user: dict, data: dict) -> bytes:
+    # Top-level so ProcessPoolExecutor can pickle it
+    return generate_vet_pdf(user, data, logo_path=str(LOGO_PATH))
+
+def iter_report_pdfs(reports, workers: int = None, cache_pdfs: bool = False):
+    """
+    Yield (report, pdf bytes) in report order. Cached PDFs are read from disk;
+    the rest render across processes with at most 2 x workers in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = deque()
+    # spawn: the API calls this from a threaded server, and forking a process
+    # that holds other threads' locks (sqlite, logging) can deadlock the children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        try:
+            for report in reports:
+                cached = report_pdf_path(report["report_id"])
+                if cached.exists():
+                    window.append((report, cached.read_bytes(), False))
+                else:
+                    window.append((report, pool.submit(render_report_pdf, report["user"], report["data"]), True))
+                while len(window) >= 2 * workers:
+                    yield _resolve(window.popleft(), cache_pdfs)
+            while window:
+                yield _resolve(window.popleft(), cache_pdfs)
+        finally:
+            # Consumer went away (closed download): drop queued renders
+            pool.shutdown(wait=True, cancel_futures=True)
+
+def _resolve(item, cache_pdfs: bool):
+    report, pdf, rendered = item
+    if rendered:
+        pdf = pdf.result()
+        if cache_pdfs:
+            path = report_pdf_path(report["report_id"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(pdf)
+    return report, pdf
+
+# ---------------------------
+# ZIP stream
+# ---------------------------
+class _ChunkSink:
+    # Write-only, non-seekable: zipfile falls back to data descriptors and never seeks back
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+def _folder(report: dict) -> str:
+    email = re.sub(r"[^A-Za-z0-9._-]+", "_", report["user"]["email"] or "")
+    return f"founders/{report['user_id']}_{email}"
+
+def stream_export_zip(cohort=None, since=None, until=None, industry=None, after_id: int = 0,
+                      limit: int = None, part: int = 1, workers: int = None, cache_pdfs: bool = False):
+    """
+    Yield one complete export archive as byte chunks: the reports after `after_id`,
+    at most `limit` of them. export.json's last_report_id and `more` say where the
+    next part starts.
+    """
+    filters = {"cohort": cohort, "since": since, "until": until, "industry": industry}
+    sink = _ChunkSink()
+    count, last_id = 0, after_id
+    with tempfile.TemporaryFile() as manifest, zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if not after_id:
+            with zf.open("users.jsonl", "w") as f:
+                for user in iter_users(cohort, industry):
+                    f.write((json.dumps(user) + "\n").encode("utf-8"))
+                    if sink.chunks:
+                        yield sink.drain()
+            yield sink.drain()
+
+        reports = iter_reports(cohort, since, until, industry, after_id=after_id)
+        if limit:
+            reports = islice(reports, limit)
+        for report, pdf in iter_report_pdfs(reports, workers=workers, cache_pdfs=cache_pdfs):
+            base = f"{_folder(report)}/{report['report_id']}_{report['stage']}"
+            # PDFs are already compressed; storing them avoids burning CPU on deflate
+            zf.writestr(f"{base}.pdf", pdf, compress_type=zipfile.ZIP_STORED)
+            zf.writestr(f"{base}.json", json.dumps(report["data"], indent=2))
+            meta = {k: v for k, v in report.items() if k != "data"}
+            manifest.write((json.dumps({**meta, "pdf": f"{base}.pdf", "json": f"{base}.json"}) + "\n").encode("utf-8"))
+            count, last_id = count + 1, report["report_id"]
+            yield sink.drain()
+
+        manifest.seek(0)
+        with zf.open("manifest.jsonl", "w") as f:
+            shutil.copyfileobj(manifest, f)
+        zf.writestr("export.json", json.dumps({
+            "filters": filters, "part": part, "after_id": after_id, "count": count, "last_report_id": last_id,
+            "more": bool(limit) and count == limit and has_reports_after(last_id, **filters),
+        }, indent=2))
+    yield sink.drain()
+
+def part_path(out: str, part: int) -> str:
+    stem, ext = os.path.splitext(out)
+    return f"{stem}.part{part:03d}{ext or '.zip'}"
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Export XQ reports as a streaming ZIP")
+    parser.add_argument("out", help="output .zip path")
+    parser.add_argument("--cohort", help="signup month, YYYY-MM")
+    parser.add_argument("--since", help="reports created on/after YYYY-MM-DD")
+    parser.add_argument("--until", help="reports created on/before YYYY-MM-DD")
+    parser.add_argument("--industry")
+    parser.add_argument("--after-id", type=int, default=0, help="skip reports with id <= this")
+    parser.add_argument("--resume-from", help="checkpoint file of an interrupted export; reuses its filters")
+    parser.add_argument("--part-size", type=int, default=EXPORT_PART_SIZE,
+                        help="reports per archive part, written as <out>.partNNN.zip (0: one archive at <out>)")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: all cores)")
+    parser.add_argument("--cache-pdfs", action="store_true", help=f"keep rendered PDFs under {report_pdf_path(0).parent}")
+    args = parser.parse_args()
+
+    filters = {"cohort": args.cohort, "since": args.since, "until": args.until, "industry": args.industry}
+    after_id, part = args.after_id, 1
+    if args.resume_from:
+        with open(args.resume_from, encoding="utf-8") as f:
+            ckpt = json.load(f)
+        filters, after_id, part = ckpt["filters"], ckpt["last_report_id"], ckpt["next_part"]
+
+    checkpoint = f"{args.out}.checkpoint"
+
+    def save_checkpoint(report_id: int, next_part: int):
+        with open(checkpoint, "w", encoding="utf-8") as f:
+            json.dump({"filters": filters, "last_report_id": report_id, "next_part": next_part}, f)
+
+    while True:
+        path = part_path(args.out, part) if args.part_size else args.out
+        save_checkpoint(after_id, part)
+        # Written under a temp name so a killed run never leaves a half archive under the real one
+        with open(f"{path}.tmp", "wb") as out:
+            for chunk in stream_export_zip(**filters, after_id=after_id, limit=args.part_size or None, part=part,
+                                           workers=args.workers, cache_pdfs=args.cache_pdfs):
+                out.write(chunk)
+        os.replace(f"{path}.tmp", path)
+        with zipfile.ZipFile(path) as zf:
+            info = json.loads(zf.read("export.json"))
+        print(f"Wrote {path} ({info['count']} reports)")
+        if not info["more"]:
+            break
+        after_id, part = info["last_report_id"], part + 1
+    os.remove(checkpoint)
+
+if __name__ == "__main__":
+    main()
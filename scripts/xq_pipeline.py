@@ -0,0 +1,502 @@
+# xq_pipeline.py
+# Streamlit-free core of the VET / SHAPE / SCOPE / LAUNCH pipeline.
+# Imported by the Streamlit UI (app_sample.py) and the job API (xq_api.py).
+import os, json, re, time, io, hashlib, sqlite3
+from pathlib import Path
+from textwrap import dedent
+
+import requests
+from dotenv import load_dotenv
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_LEFT
+
+from xq_trace import span, traced
+
+# ---------------------------
+# Prompt templates for VET / SHAPE / SCOPE / LAUNCH
+# ---------------------------
+
+# VET
+VET_SYSTEM = dedent("""\
+You are an expert startup vetting assistant. Your task is to evaluate an idea quickly and produce a compact, factual JSON report suitable for programmatic parsing.
+
+REQUIREMENTS:
+- Output exactly one JSON object inside aetc etc ...
+""")
+
+def VET_USER(industry: str, one_liner: str, desc: str, founder_ctx: str) -> str:
+    prompt = dedent(f"""\
+    Evaluate this startup idea.
+
+    Industry: {industry}
+    One-liner: {one_liner}
+    Description: {desc}
+    Founder context: {founder_ctx}
+
+    Produce the JSON object as specified by the system instructions above.
+    """)
+    return prompt
+
+# SHAPE
+SHAPE_SYSTEM = dedent("""\
+You are an expert product strategist. Given an idea, produce improved one-liner variants and short rationale.
+
+REQUIREMENTS:
+- Return exactly one JSON object etc etc ...
+""")
+
+def SHAPE_USER(one_liner: str, vet_json_str: str) -> str:
+    prompt = dedent(f"""\
+    Original one-liner: {one_liner}
+    VET output: {vet_json_str}
+
+    Generate two improved variants and the fields required by SHAPE_SYSTEM.
+    """)
+    return prompt
+
+# SCOPE
+SCOPE_SYSTEM = dedent("""\
+You are a pragmatic product manager. Produce a concise MVP (30-day) scope.
+
+REQUIREMENTS:
+- Output exactly one JSON object inside a fenced ```json ... ``` block.
+- JSON keys:
+  - etc etc)
+""")
+
+def SCOPE_USER(base_one_liner: str, industry: str, constraints: str) -> str:
+    prompt = dedent(f"""\
+    One-liner to scope: {base_one_liner}
+    Industry: {industry}
+    Constraints: {constraints}
+
+    Produce a 30-day MVP scope per SCOPE_SYSTEM.
+    """)
+    return prompt
+
+# LAUNCH
+LAUNCH_SYSTEM = dedent("""\
+You are a go-to-market operator. Produce a compact launch plan and deck outline.
+
+REQUIREMENTS:
+- Output exactly one JSON object inside a fenced ```json ... ``` block.
+- JSON keys:
+  - ietc etc
+""")
+
+def LAUNCH_USER(one_liner: str, icp_hint: str) -> str:
+    prompt = dedent(f"""\
+    One-liner: {one_liner}
+    ICP hint: {icp_hint}
+
+    Produce the LAUNCH JSON per LAUNCH_SYSTEM.
+    """)
+    return prompt
+
+# ---------------------------
+# end prompt templates
+# ---------------------------
+
+def generate_vet_pdf(user: dict, vet_data: dict, logo_path: str = None) -> bytes:
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    style_normal = styles["Normal"]
+    style_heading = styles["Heading1"]
+    style_heading.alignment = TA_LEFT
+
+    story = []
+
+    # Add logo if available
+    if logo_path and Path(logo_path).exists():
+        try:
+            story.append(Image(str(logo_path), width=2*inch, height=2*inch))
+            story.append(Spacer(1, 12))
+        except:
+            pass
+
+    # Header
+    story.append(Paragraph("XQ — Investor-Readiness Report", style_heading))
+    story.append(Spacer(1, 12))
+
+    # User info
+    story.append(Paragraph(f"<b>Name:</b> {user['name']}", style_normal))
+    story.append(Paragraph(f"<b>Email:</b> {user['email']}", style_normal))
+    story.append(Paragraph(f"<b>Phone:</b> {user['phone']}", style_normal))
+    story.append(Spacer(1, 12))
+
+    # Verdict
+    story.append(Paragraph(f"<b>Verdict:</b> {vet_data.get('verdict', '-')}", style_normal))
+    story.append(Spacer(1, 12))
+
+    # Summary
+    story.append(Paragraph("<b>Summary:</b>", style_normal))
+    story.append(Paragraph(vet_data.get("summary", "—"), style_normal))
+    story.append(Spacer(1, 12))
+
+    # Scores
+    story.append(Paragraph("<b>Scores:</b>", style_normal))
+    for k, v in vet_data.get("scores", {}).items():
+        story.append(Paragraph(f"{k.replace('_',' ').title()}: {v}", style_normal))
+    story.append(Spacer(1, 12))
+
+    # Top Risks
+    story.append(Paragraph("<b>Top Risks:</b>", style_normal))
+    for item in vet_data.get("top_risks", []):
+        story.append(Paragraph(f"• {item}", style_normal))
+    story.append(Spacer(1, 12))
+
+    # Must Fix
+    story.append(Paragraph("<b>Must Fix:</b>", style_normal))
+    for item in vet_data.get("must_fix", []):
+        story.append(Paragraph(f"• {item}", style_normal))
+
+    with span("pdf.build", flowables=len(story)):
+        doc.build(story)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+# ---------------------------
+# ENV & CONFIG
+# ---------------------------
+BASE_DIR = Path(__file__).parent
+ASSETS_DIR = BASE_DIR / "assets"
+LOGO_PATH = ASSETS_DIR / "xq_logo.png"  # change if needed
+DB_PATH = BASE_DIR / "xq.db"
+
+load_dotenv()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
+GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+# Override to point at a local OpenAI-compatible stub (see xq_stub_llm.py)
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# ---------------------------
+# LLM (Groq) minimal wrapper
+# ---------------------------
+class GroqError(Exception): ...
+
+def groq_completion(messages, model: str = GROQ_MODEL, temperature: float = 0.2, max_tokens: int = 900, retries: int = 3, timeout: int = 30) -> dict:
+    """
+    Like groq_chat, but also returns finish_reason and the completion token count.
+    Returns {"content": str, "finish_reason": str | None, "completion_tokens": int}.
+    """
+    if not GROQ_API_KEY:
+        raise GroqError("GROQ_API_KEY missing. Add it to .env or environment.")
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    last_err = None
+    for attempt in range(1, retries + 1):
+        try:
+            with span("groq.http", model=model, attempt=attempt):
+                r = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(payload), timeout=timeout)
+            if r.status_code == 200:
+                data = r.json()
+                choice = data["choices"][0]
+                content = choice["message"]["content"] or ""
+                usage = data.get("usage") or {}
+                return {
+                    "content": content,
+                    "finish_reason": choice.get("finish_reason"),
+                    # rough chars/4 fallback if the backend omits usage
+                    "completion_tokens": int(usage.get("completion_tokens") or len(content) // 4),
+                }
+            last_err = GroqError(f"HTTP {r.status_code}: {r.text[:400]}")
+        except requests.RequestException as e:
+            last_err = e
+        with span("groq.retry_sleep", attempt=attempt):
+            time.sleep(1.5 * attempt)
+    raise GroqError(f"Groq chat failed after {retries} tries: {last_err}")
+
+def groq_chat(messages, model: str = GROQ_MODEL, temperature: float = 0.2, max_tokens: int = 900, retries: int = 3, timeout: int = 30) -> str:
+    return groq_completion(messages, model=model, temperature=temperature, max_tokens=max_tokens, retries=retries, timeout=timeout)["content"]
+
+# ---------------------------
+# Helpers
+# ---------------------------
+@traced("extract_json")
+def extract_json_block(text: str):
+    if not text:
+        return None
+    fence = re.search(r"""```json\s*(\{.*?\})\s*```""", text, flags=re.S|re.M)
+    if fence:
+        try:
+            return json.loads(fence.group(1))
+        except json.JSONDecodeError:
+            pass
+    brace = re.search(r"(\{.*\})", text, flags=re.S)
+    if brace:
+        try:
+            return json.loads(brace.group(1))
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+# ---------------------------
+# Users + free trial (shared by the UI and the job API)
+# ---------------------------
+from datetime import datetime, timezone
+try:
+    import dateutil.parser as _dp
+    _HAS_DATEUTIL = True
+except Exception:
+    _HAS_DATEUTIL = False
+
+TRIAL_DAYS = 7
+TRIAL_MAX_IDEAS = 2
+
+def _parse_dt_safe(s):
+    if not s:
+        return None
+    try:
+        if _HAS_DATEUTIL:
+            dt = _dp.isoparse(s)
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt
+        else:
+            return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
+    except Exception:
+        return None
+
+def is_trial_active(user_record):
+    """
+    Defensive trial check.
+    Returns (bool active, dict debug)
+    Trial active while BOTH:
+      - account age < 7 days
+      - idea_count < 2
+    """
+    debug = {}
+    idea_count = int(user_record.get("idea_count") or 0)
+    debug['idea_count'] = idea_count
+
+    created_at = user_record.get("created_at")
+    created_dt = _parse_dt_safe(created_at)
+    if created_dt is None:
+        created_dt = datetime.now(timezone.utc)
+        debug['created_at_used'] = 'missing_or_invalid_set_now'
+    else:
+        debug['created_at_used'] = created_at
+
+    now = datetime.now(timezone.utc)
+    delta_days = (now - created_dt).total_seconds() / 86400.0
+    debug['delta_days'] = delta_days
+
+    active = (delta_days < TRIAL_DAYS) and (idea_count < TRIAL_MAX_IDEAS)
+    debug['active'] = active
+    return active, debug
+
+def users_init(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            idea_count INTEGER DEFAULT 0
+        )
+    """)
+
+def get_user_by_email(email: str) -> dict | None:
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        users_init(cur)
+        cur.execute("SELECT id, name, email, phone, created_at, idea_count FROM users WHERE email=?", ((email or "").lower().strip(),))
+        row = cur.fetchone()
+    if row:
+        return {"id": row[0], "name": row[1], "email": row[2], "phone": row[3], "created_at": row[4], "idea_count": row[5]}
+    return None
+
+def claim_trial_idea(user: dict) -> bool:
+    """
+    Server-side trial gate: check the trial window and count the idea in one
+    conditional UPDATE, so concurrent submits cannot both slip under the limit.
+    """
+    active, _ = is_trial_active(user)
+    if not active:
+        return False
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        cur.execute(
+            "UPDATE users SET idea_count = COALESCE(idea_count,0) + 1 WHERE id=? AND COALESCE(idea_count,0) < ?",
+            (user["id"], TRIAL_MAX_IDEAS),
+        )
+        con.commit()
+        return cur.rowcount == 1
+
+def refund_trial_idea(user_id: int):
+    # A claimed idea whose VET run produced no report does not count (same as the UI's direct mode)
+    with sqlite3.connect(DB_PATH) as con:
+        con.execute("UPDATE users SET idea_count = idea_count - 1 WHERE id=? AND idea_count > 0", (user_id,))
+        con.commit()
+
+# ---------------------------
+# Stage runner (shared by UI and job API)
+# ---------------------------
+STAGES = {
+    "vet":    {"system": VET_SYSTEM,    "user": VET_USER,    "temperature": 0.15, "max_tokens": 900},
+    "shape":  {"system": SHAPE_SYSTEM,  "user": SHAPE_USER,  "temperature": 0.25, "max_tokens": 1000},
+    "scope":  {"system": SCOPE_SYSTEM,  "user": SCOPE_USER,  "temperature": 0.2,  "max_tokens": 900},
+    "launch": {"system": LAUNCH_SYSTEM, "user": LAUNCH_USER, "temperature": 0.25, "max_tokens": 1100},
+}
+
+def prompt_variant(stage: str) -> str:
+    # Changes whenever the stage's system prompt is edited, so old length stats stop applying
+    return hashlib.sha1(STAGES[stage]["system"].encode("utf-8")).hexdigest()[:8]
+
+def build_messages(stage: str, inputs: dict) -> list:
+    spec = STAGES[stage]
+    return [
+        {"role": "system", "content": spec["system"]},
+        {"role": "user", "content": spec["user"](**inputs)},
+    ]
+
+# ---------------------------
+# Adaptive max_tokens (learned from completion lengths)
+# ---------------------------
+TOKEN_STATS_WINDOW = 200        # most recent completions per stage + prompt variant + model
+TOKEN_STATS_MIN_SAMPLES = 20    # below this, use the stage's static max_tokens
+TOKEN_BUDGET_PERCENTILE = 95
+TOKEN_BUDGET_MARGIN = 1.15      # multiplier on the percentile ...
+TOKEN_BUDGET_PAD = 32           # ... plus a flat pad
+TOKEN_BUDGET_FLOOR = 256
+MAX_CONTINUATIONS = 2
+CONTINUE_PROMPT = "You were cut off. Continue exactly where you stopped. Do not repeat anything and do not add commentary."
+
+def _completion_stats_init(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS completion_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            model TEXT,
+            completion_tokens INTEGER NOT NULL,
+            max_tokens INTEGER,
+            continuations INTEGER DEFAULT 0,
+            finish_reason TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_completion_stats_route ON completion_stats(stage, variant, model, id)")
+
+def record_completion(stage: str, variant: str, model: str, completion_tokens: int, max_tokens: int, continuations: int, finish_reason: str | None):
+    try:
+        with sqlite3.connect(DB_PATH) as con:
+            cur = con.cursor()
+            _completion_stats_init(cur)
+            cur.execute(
+                "INSERT INTO completion_stats(stage, variant, model, completion_tokens, max_tokens, continuations, finish_reason) VALUES (?,?,?,?,?,?,?)",
+                (stage, variant, model, completion_tokens, max_tokens, continuations, finish_reason),
+            )
+            con.commit()
+    except sqlite3.Error as e:
+        print("WARNING: failed to record completion stats:", e)
+
+def adaptive_max_tokens(stage: str, variant: str, model: str) -> int:
+    """
+    High percentile of recent total completion lengths for this stage/variant/model, plus a margin.
+    Falls back to the stage's static max_tokens until enough samples exist.
+    Completions still cut off after MAX_CONTINUATIONS only give a lower bound on the
+    true length, so they are left out rather than pulling the percentile down.
+    """
+    static = STAGES[stage]["max_tokens"]
+    try:
+        with sqlite3.connect(DB_PATH) as con:
+            cur = con.cursor()
+            _completion_stats_init(cur)
+            cur.execute(
+                "SELECT completion_tokens FROM completion_stats "
+                "WHERE stage=? AND variant=? AND model=? AND finish_reason IS NOT 'length' "
+                "ORDER BY id DESC LIMIT ?",
+                (stage, variant, model, TOKEN_STATS_WINDOW),
+            )
+            lengths = sorted(row[0] for row in cur.fetchall())
+    except sqlite3.Error:
+        return static
+    if len(lengths) < TOKEN_STATS_MIN_SAMPLES:
+        return static
+    idx = min(len(lengths) - 1, int(TOKEN_BUDGET_PERCENTILE / 100.0 * len(lengths)))
+    budget = int(lengths[idx] * TOKEN_BUDGET_MARGIN) + TOKEN_BUDGET_PAD
+    return max(TOKEN_BUDGET_FLOOR, min(budget, static * 2))
+
+def run_stage(stage: str, inputs: dict, model: str = GROQ_MODEL) -> tuple[dict | None, str]:
+    """
+    Run one pipeline stage synchronously.
+    Returns (parsed JSON or None, raw model output).
+    A completion cut off at max_tokens is continued, not regenerated.
+    """
+    with span("stage", stage=stage, model=model):
+        return _run_stage(stage, inputs, model)
+
+def _run_stage(stage: str, inputs: dict, model: str) -> tuple[dict | None, str]:
+    spec = STAGES[stage]
+    variant = prompt_variant(stage)
+    max_tokens = adaptive_max_tokens(stage, variant, model)
+    messages = build_messages(stage, inputs)
+    res = groq_completion(messages, model=model, temperature=spec["temperature"], max_tokens=max_tokens)
+    out, total_tokens, continuations = res["content"], res["completion_tokens"], 0
+    while res["finish_reason"] == "length" and continuations < MAX_CONTINUATIONS:
+        continuations += 1
+        follow_up = messages + [
+            {"role": "assistant", "content": out},
+            {"role": "user", "content": CONTINUE_PROMPT},
+        ]
+        res = groq_completion(follow_up, model=model, temperature=spec["temperature"], max_tokens=spec["max_tokens"])
+        out += res["content"]
+        total_tokens += res["completion_tokens"]
+    # Record the full length (all continuations) so the budget learns the true size;
+    # a final finish_reason of "length" marks it as truncated
+    record_completion(stage, variant, model, total_tokens, max_tokens, continuations, res["finish_reason"])
+    return extract_json_block(out), out
+
+# ---------------------------
+# Saved reports (feeds the bulk export in xq_export.py)
+# ---------------------------
+REPORTS_DIR = BASE_DIR / "reports"   # cached PDFs, <report_id>.pdf
+
+def reports_init(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            stage TEXT NOT NULL,
+            industry TEXT,
+            data TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reports_user ON reports(user_id)")
+
+@traced("db.save_report")
+def save_report(user_id: int, stage: str, data: dict, industry: str | None = None) -> int | None:
+    # Only attach reports to an existing founder; anything else is dropped (returns None)
+    if not user_id:
+        return None
+    with sqlite3.connect(DB_PATH) as con:
+        cur = con.cursor()
+        users_init(cur)
+        reports_init(cur)
+        cur.execute(
+            "INSERT INTO reports(user_id, stage, industry, data) "
+            "SELECT id, ?, ?, ? FROM users WHERE id = ?",
+            (stage, industry, json.dumps(data), user_id),
+        )
+        con.commit()
+        return cur.lastrowid if cur.rowcount == 1 else None
+
+def report_pdf_path(report_id: int) -> Path:
+    return REPORTS_DIR / f"{report_id}.pdf"
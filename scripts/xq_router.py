@@ -0,0 +1,208 @@
+# xq_router.py
+# Latency-aware model routing per pipeline stage.
+#
+# Each stage has a "large" model (quality) and a "fast" model (latency). The router
+# sends a stage to the fast model when the job queue is deep or the large model's
+# recent p95 for that stage is over its latency budget. While over budget, one
+# request in XQ_ROUTER_PROBE_EVERY still probes the large model, so fresh samples
+# bring it back as soon as it recovers.
+#
+# Latency samples and the decision log live in xq.db, so the API process and any
+# --workers-only processes route on the same numbers and GET /router shows them
+# all. Only the probe cadence counter is per process.
+import os, time, sqlite3, threading
+
+import xq_pipeline
+from xq_pipeline import GROQ_MODEL, GroqError, run_stage
+
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+
+def _stage_env(name: str, stage: str, default):
+    return os.getenv(f"{name}_{stage.upper()}", default)
+
+# ---------------------------
+# Routing table (env overrides: GROQ_MODEL_VET, GROQ_FAST_MODEL_VET, XQ_SLO_VET, ...)
+# ---------------------------
+DEFAULT_SLO_SECONDS = {"vet": 8.0, "shape": 10.0, "scope": 10.0, "launch": 12.0}
+
+STAGE_MODELS = {
+    stage: {
+        "large": _stage_env("GROQ_MODEL", stage, GROQ_MODEL),
+        "fast": _stage_env("GROQ_FAST_MODEL", stage, GROQ_FAST_MODEL),
+        "slo_s": float(_stage_env("XQ_SLO", stage, slo)),
+    }
+    for stage, slo in DEFAULT_SLO_SECONDS.items()
+}
+
+XQ_ROUTER_QUEUE_LIMIT = int(os.getenv("XQ_ROUTER_QUEUE_LIMIT", "8"))
+XQ_ROUTER_WINDOW_S = float(os.getenv("XQ_ROUTER_WINDOW_S", "300"))
+# While degraded, every Nth request still goes to the large model so its p95 can recover (0 = never)
+XQ_ROUTER_PROBE_EVERY = int(os.getenv("XQ_ROUTER_PROBE_EVERY", "10"))
+ROUTER_DECISIONS_KEPT = 50
+
+def _percentile(values: list, pct: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+# ---------------------------
+# Latency stats (shared via xq.db)
+# ---------------------------
+def _router_init(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS router_samples (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT NOT NULL,
+            model TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            ok INTEGER NOT NULL,
+            ts REAL NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_router_samples_route ON router_samples(stage, model, ts)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS router_decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            stage TEXT NOT NULL,
+            model TEXT NOT NULL,
+            reason TEXT,
+            queue_depth INTEGER,
+            p95_large REAL
+        )
+    """)
+
+# ---------------------------
+# Router
+# ---------------------------
+class ModelRouter:
+    def __init__(self, table: dict = None, queue_limit: int = XQ_ROUTER_QUEUE_LIMIT,
+                 window_s: float = XQ_ROUTER_WINDOW_S, probe_every: int = XQ_ROUTER_PROBE_EVERY,
+                 max_samples: int = 200, clock=time.time, db_path=None):
+        self.table = table or STAGE_MODELS
+        self.queue_limit = queue_limit
+        self.window_s = window_s
+        self.probe_every = probe_every
+        self.max_samples = max_samples
+        self.clock = clock                  # wall clock by default: samples are compared across processes
+        self.db_path = db_path              # None: xq_pipeline.DB_PATH
+        self._degraded = {}                 # stage -> consecutive over-SLO decisions (this process)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path or xq_pipeline.DB_PATH)
+        _router_init(con.cursor())
+        return con
+
+    def record(self, stage: str, model: str, seconds: float, ok: bool = True):
+        now = self.clock()
+        try:
+            with self._connect() as con:
+                con.execute(
+                    "INSERT INTO router_samples(stage, model, seconds, ok, ts) VALUES (?,?,?,?,?)",
+                    (stage, model, seconds, int(ok), now),
+                )
+                # Samples older than the window never count again
+                con.execute("DELETE FROM router_samples WHERE ts < ?", (now - self.window_s,))
+        except sqlite3.Error as e:
+            print("WARNING: failed to record router sample:", e)
+
+    def _recent(self, con, stage: str, model: str) -> list:
+        return con.execute(
+            "SELECT seconds, ok FROM router_samples WHERE stage=? AND model=? AND ts >= ? ORDER BY id DESC LIMIT ?",
+            (stage, model, self.clock() - self.window_s, self.max_samples),
+        ).fetchall()
+
+    def p95(self, stage: str, model: str) -> float | None:
+        try:
+            with self._connect() as con:
+                return _percentile([s[0] for s in self._recent(con, stage, model)], 95)
+        except sqlite3.Error:
+            return None
+
+    def fast_model(self, stage: str) -> str:
+        return self.table[stage]["fast"]
+
+    def large_model(self, stage: str) -> str:
+        return self.table[stage]["large"]
+
+    def pick(self, stage: str, queue_depth: int = 0) -> str:
+        route = self.table[stage]
+        p95 = self.p95(stage, route["large"])
+        if queue_depth >= self.queue_limit:
+            model, reason = route["fast"], f"queue_depth {queue_depth} >= {self.queue_limit}"
+        elif p95 is not None and p95 > route["slo_s"]:
+            with self._lock:
+                self._degraded[stage] = self._degraded.get(stage, 0) + 1
+                probe = self.probe_every and self._degraded[stage] % self.probe_every == 0
+            if probe:
+                model, reason = route["large"], f"probe: p95 {p95:.2f}s > slo {route['slo_s']:.2f}s"
+            else:
+                model, reason = route["fast"], f"p95 {p95:.2f}s > slo {route['slo_s']:.2f}s"
+        else:
+            with self._lock:
+                self._degraded.pop(stage, None)
+            model, reason = route["large"], "within slo"
+        try:
+            with self._connect() as con:
+                cur = con.execute(
+                    "INSERT INTO router_decisions(ts, stage, model, reason, queue_depth, p95_large) VALUES (?,?,?,?,?,?)",
+                    (time.time(), stage, model, reason, queue_depth, p95),
+                )
+                con.execute("DELETE FROM router_decisions WHERE id <= ?", (cur.lastrowid - ROUTER_DECISIONS_KEPT,))
+        except sqlite3.Error as e:
+            print("WARNING: failed to log router decision:", e)
+        return model
+
+    def run(self, stage: str, inputs: dict, queue_depth: int = 0, model: str = None) -> tuple[dict | None, str, str]:
+        """
+        Pick a model (unless one is forced), run the stage and record its latency.
+        Returns (parsed JSON or None, raw output, model used).
+        """
+        model = model or self.pick(stage, queue_depth)
+        t0 = time.perf_counter()
+        try:
+            data, raw = run_stage(stage, inputs, model=model)
+        except GroqError:
+            self.record(stage, model, time.perf_counter() - t0, ok=False)
+            raise
+        self.record(stage, model, time.perf_counter() - t0)
+        return data, raw, model
+
+    def snapshot(self) -> dict:
+        stats, decisions = {}, []
+        try:
+            with self._connect() as con:
+                routes = con.execute(
+                    "SELECT DISTINCT stage, model FROM router_samples WHERE ts >= ? ORDER BY stage, model",
+                    (self.clock() - self.window_s,),
+                ).fetchall()
+                for stage, model in routes:
+                    recent = self._recent(con, stage, model)
+                    secs = [s[0] for s in recent]
+                    stats[f"{stage}/{model}"] = {
+                        "n": len(recent),
+                        "errors": sum(1 for s in recent if not s[1]),
+                        "p50_s": _percentile(secs, 50),
+                        "p95_s": _percentile(secs, 95),
+                    }
+                rows = con.execute(
+                    "SELECT ts, stage, model, reason, queue_depth, p95_large FROM router_decisions ORDER BY id DESC LIMIT ?",
+                    (ROUTER_DECISIONS_KEPT,),
+                ).fetchall()
+                decisions = [dict(zip(("ts", "stage", "model", "reason", "queue_depth", "p95_large"), r)) for r in reversed(rows)]
+        except sqlite3.Error as e:
+            print("WARNING: failed to read router stats:", e)
+        return {
+            "routes": self.table,
+            "queue_limit": self.queue_limit,
+            "window_s": self.window_s,
+            "probe_every": self.probe_every,
+            "scope": "latency and decisions: all processes sharing xq.db; probe cadence: per process",
+            "latency": stats,
+            "decisions": decisions,
+        }
+
+router = ModelRouter()
@@ -0,0 +1,53 @@
+# xq_stub_llm.py
+# Local OpenAI-compatible stub for exercising the router without Groq.
+#
+#   XQ_STUB_LATENCY="llama-3.1-8b-instant=0.3,mixtral-8x7b-32768=4" uvicorn xq_stub_llm:app --port 8700
+#   GROQ_API_URL=http://localhost:8700/openai/v1/chat/completions GROQ_API_KEY=stub uvicorn xq_api:app
+#
+# XQ_STUB_TRUNCATE=N cuts every answer into N+1 pieces: the first N calls of a
+# completion end with finish_reason "length", and a continuation request (the
+# partial answer sent back as an assistant turn) gets the next piece.
+import os, json, time, asyncio
+
+from fastapi import FastAPI, Request
+
+def _parse_latency(spec: str) -> dict:
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        model, _, secs = part.partition("=")
+        out[model.strip()] = float(secs)
+    return out
+
+STUB_LATENCY = _parse_latency(os.getenv("XQ_STUB_LATENCY", ""))
+STUB_DEFAULT_LATENCY = float(os.getenv("XQ_STUB_DEFAULT_LATENCY", "0.2"))
+STUB_TRUNCATE = int(os.getenv("XQ_STUB_TRUNCATE", "0"))
+
+STUB_REPORT = {
+    "verdict": "Promising",
+    "summary": "Stub response from xq_stub_llm.",
+    "scores": {"market": 6, "feasibility": 7},
+    "top_risks": ["stub risk"],
+    "must_fix": ["stub fix"],
+}
+
+app = FastAPI(title="XQ stub LLM")
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "")
+    await asyncio.sleep(STUB_LATENCY.get(model, STUB_DEFAULT_LATENCY))
+    content = "```json\n" + json.dumps({**STUB_REPORT, "model": model}) + "\n```"
+    finish_reason = "stop"
+    if STUB_TRUNCATE:
+        step = -(-len(content) // (STUB_TRUNCATE + 1))
+        sent = sum(len(m.get("content", "")) for m in body.get("messages", []) if m.get("role") == "assistant")
+        finish_reason = "length" if sent + step < len(content) else "stop"
+        content = content[sent:sent + step]
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4},
+    }
@@ -0,0 +1,189 @@
+# xq_trace.py
+# Lightweight span tracing + sampling profiler.
+#
+# A trace covers one unit of work (a Streamlit rerun, an API job). Spans nest
+# inside it and are written as one compact JSON line per trace to XQ_TRACE_FILE:
+#   {"trace_id": ..., "name": "rerun", "ts": ..., "dur_ms": ..., "spans": [[name, parent, start_ms, dur_ms, attrs], ...]}
+# With tracing off, span() is a contextvar lookup returning a shared no-op.
+# The open span is tracked per context, so spans opened from threads or tasks
+# that share one trace (asyncio.to_thread copies the context) nest correctly.
+import os, sys, json, time, uuid, threading, contextvars
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+XQ_TRACE_FILE = Path(os.getenv("XQ_TRACE_FILE", BASE_DIR / "traces.jsonl"))
+XQ_PROFILE_DIR = Path(os.getenv("XQ_PROFILE_DIR", BASE_DIR / "profiles"))
+
+_enabled = os.getenv("XQ_TRACE", "0") == "1"
+_current = contextvars.ContextVar("xq_trace", default=None)
+_open_span = contextvars.ContextVar("xq_span", default=None)     # (trace, span index) of the innermost open span
+_write_lock = threading.Lock()
+_NOOP = nullcontext()
+
+def tracing_enabled() -> bool:
+    return _enabled
+
+def set_tracing_enabled(on: bool):
+    global _enabled
+    _enabled = bool(on)
+
+# Process-wide profiler switch: every Nth rerun of any session is profiled (0 = off)
+_profile_every = 0
+_profile_count = 0
+_profile_lock = threading.Lock()
+
+def profiling_every() -> int:
+    return _profile_every
+
+def set_profiling_enabled(on: bool, every: int = 1):
+    global _profile_every
+    _profile_every = max(1, int(every)) if on else 0
+
+def should_profile() -> bool:
+    global _profile_count
+    if not _profile_every:
+        return False
+    with _profile_lock:
+        _profile_count += 1
+        return _profile_count % _profile_every == 0
+
+# ---------------------------
+# Traces and spans
+# ---------------------------
+class Trace:
+    def __init__(self, name: str, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []     # [name, parent index, start_ms, dur_ms, attrs]
+        self.lock = threading.Lock()
+        self.token = None
+
+class _Span:
+    __slots__ = ("trace", "idx", "token")
+
+    def __init__(self, trace: Trace, name: str, attrs: dict):
+        self.trace = trace
+        self.token = None
+        open_span = _open_span.get()
+        parent = open_span[1] if open_span and open_span[0] is trace else None
+        start_ms = round((time.perf_counter() - trace.t0) * 1000, 2)
+        with trace.lock:
+            trace.spans.append([name, parent, start_ms, None, attrs or None])
+            self.idx = len(trace.spans) - 1
+
+    def __enter__(self):
+        self.token = _open_span.set((self.trace, self.idx))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        rec = self.trace.spans[self.idx]
+        rec[3] = round((time.perf_counter() - self.trace.t0) * 1000 - rec[2], 2)
+        if exc_type is not None:
+            rec[4] = {**(rec[4] or {}), "error": exc_type.__name__}
+        if self.token is not None:
+            _open_span.reset(self.token)
+        return False
+
+def start_trace(name: str, trace_id: str = None, force: bool = False) -> Trace | None:
+    # force: trace this unit even with tracing off here (a job submitted by a traced rerun)
+    if not (_enabled or force):
+        return None
+    trace = Trace(name, trace_id)
+    trace.token = _current.set(trace)
+    return trace
+
+def end_trace(trace: Trace | None, **attrs):
+    if trace is None:
+        return
+    try:
+        _current.reset(trace.token)
+    except (ValueError, RuntimeError):
+        _current.set(None)  # ended from a different context (e.g. the next Streamlit rerun)
+    record = {
+        "trace_id": trace.trace_id,
+        "name": trace.name,
+        "ts": round(trace.ts, 3),
+        "dur_ms": round((time.perf_counter() - trace.t0) * 1000, 2),
+        "spans": trace.spans,
+    }
+    if attrs:
+        record["attrs"] = attrs
+    line = json.dumps(record, separators=(",", ":"), default=str)
+    try:
+        with _write_lock:
+            XQ_TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(XQ_TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print("WARNING: failed to write trace:", e)
+
+def current_trace_id() -> str | None:
+    trace = _current.get()
+    return trace.trace_id if trace else None
+
+def span(name: str, **attrs):
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, attrs)
+
+def traced(name: str):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# ---------------------------
+# Sampling profiler (folded stacks -> speedscope / flamegraph.pl)
+# ---------------------------
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a background thread.
+    save() writes Brendan Gregg "folded" stacks: one `frame;frame;frame count` line per stack.
+    """
+
+    def __init__(self, thread_id: int = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="xq-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def save(self, name: str) -> Path:
+        XQ_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = XQ_PROFILE_DIR / f"{name}.folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
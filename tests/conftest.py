@@ -0,0 +1,34 @@
+import sys, time, socket, threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+@pytest.fixture
+def stub_llm(monkeypatch, tmp_path):
+    """
+    Serve scripts/xq_stub_llm.py on a free port and point the Groq client at it.
+    Yields the stub module; tests set STUB_LATENCY / STUB_TRUNCATE on it.
+    """
+    uvicorn = pytest.importorskip("uvicorn")
+    pytest.importorskip("fastapi")
+    xq_pipeline = pytest.importorskip("xq_pipeline")
+    import xq_stub_llm
+
+    monkeypatch.setattr(xq_stub_llm, "STUB_DEFAULT_LATENCY", 0.0)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(xq_stub_llm.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+    monkeypatch.setattr(xq_pipeline, "GROQ_API_URL", f"http://127.0.0.1:{port}/openai/v1/chat/completions")
+    monkeypatch.setattr(xq_pipeline, "GROQ_API_KEY", "test")
+    monkeypatch.setattr(xq_pipeline, "DB_PATH", tmp_path / "xq.db")
+    yield xq_stub_llm
+    server.should_exit = True
+    thread.join(timeout=10)
@@ -0,0 +1,72 @@
+# Stage runner tests: continuation of truncated completions and the learned
+# max_tokens budget (xq_pipeline.adaptive_max_tokens).
+import sqlite3
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+pytest.importorskip("reportlab")
+
+import xq_pipeline
+from xq_pipeline import (
+    MAX_CONTINUATIONS, STAGES, TOKEN_STATS_MIN_SAMPLES, TOKEN_BUDGET_FLOOR,
+    adaptive_max_tokens, prompt_variant, record_completion, run_stage,
+)
+
+INPUTS = {"industry": "SaaS / IT", "one_liner": "Invoice reminders for freelancers",
+          "desc": "Chases late invoices by email.", "founder_ctx": "Solo founder"}
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    monkeypatch.setattr(xq_pipeline, "DB_PATH", tmp_path / "xq.db")
+    return tmp_path / "xq.db"
+
+def _stats(db):
+    with sqlite3.connect(db) as con:
+        return con.execute("SELECT model, completion_tokens, continuations, finish_reason FROM completion_stats").fetchall()
+
+def test_truncated_completion_is_continued_and_parses(stub_llm, monkeypatch):
+    monkeypatch.setattr(stub_llm, "STUB_TRUNCATE", MAX_CONTINUATIONS)
+    data, raw = run_stage("vet", INPUTS, model="big")
+    assert data["verdict"] == "Promising" and data["model"] == "big"
+    [(model, tokens, continuations, finish_reason)] = _stats(xq_pipeline.DB_PATH)
+    assert model == "big" and continuations == MAX_CONTINUATIONS and finish_reason == "stop"
+    # The total across all pieces, not just the last one
+    assert tokens >= len(raw) // 4 - MAX_CONTINUATIONS
+
+def test_still_truncated_after_max_continuations_is_flagged(stub_llm, monkeypatch):
+    monkeypatch.setattr(stub_llm, "STUB_TRUNCATE", MAX_CONTINUATIONS + 1)
+    data, _ = run_stage("vet", INPUTS, model="big")
+    assert data is None
+    [(_, _, continuations, finish_reason)] = _stats(xq_pipeline.DB_PATH)
+    assert continuations == MAX_CONTINUATIONS and finish_reason == "length"
+
+def test_budget_is_static_until_min_samples(db):
+    variant = prompt_variant("vet")
+    for _ in range(TOKEN_STATS_MIN_SAMPLES - 1):
+        record_completion("vet", variant, "big", 300, 900, 0, "stop")
+    assert adaptive_max_tokens("vet", variant, "big") == STAGES["vet"]["max_tokens"]
+
+def test_budget_is_p95_with_margin(db):
+    variant = prompt_variant("vet")
+    for n in range(300, 400):
+        record_completion("vet", variant, "big", n, 900, 0, "stop")
+    # sorted lengths 300..399, p95 index 95 -> 395; 395 * 1.15 + 32
+    assert adaptive_max_tokens("vet", variant, "big") == int(395 * 1.15) + 32
+
+def test_budget_is_clamped(db):
+    variant, static = prompt_variant("vet"), STAGES["vet"]["max_tokens"]
+    for _ in range(TOKEN_STATS_MIN_SAMPLES):
+        record_completion("vet", variant, "short", 10, 900, 0, "stop")
+        record_completion("vet", variant, "long", 50_000, 900, 0, "stop")
+    assert adaptive_max_tokens("vet", variant, "short") == TOKEN_BUDGET_FLOOR
+    assert adaptive_max_tokens("vet", variant, "long") == 2 * static
+
+def test_budget_skips_still_truncated_rows_and_other_models(db):
+    variant = prompt_variant("vet")
+    for _ in range(TOKEN_STATS_MIN_SAMPLES):
+        record_completion("vet", variant, "big", 400, 900, 0, "stop")
+        record_completion("vet", variant, "big", 100, 120, MAX_CONTINUATIONS, "length")
+        record_completion("vet", variant, "small", 1500, 900, 0, "stop")
+    assert adaptive_max_tokens("vet", variant, "big") == int(400 * 1.15) + 32
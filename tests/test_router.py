@@ -0,0 +1,83 @@
+# Router tests: routing decisions against a fake clock, plus one end-to-end run
+# against the stub LLM (scripts/xq_stub_llm.py).
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+pytest.importorskip("reportlab")
+
+from xq_router import ModelRouter
+
+TABLE = {"vet": {"large": "big", "fast": "small", "slo_s": 1.0}}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def make_router(tmp_path):
+    def make(**kw):
+        kw.setdefault("queue_limit", 4)
+        kw.setdefault("window_s", 60)
+        kw.setdefault("probe_every", 0)
+        kw.setdefault("clock", FakeClock())
+        return ModelRouter(table=TABLE, db_path=tmp_path / "xq.db", **kw), kw["clock"]
+    return make
+
+def test_pick_large_without_samples(make_router):
+    router, _ = make_router()
+    assert router.pick("vet") == "big"
+
+def test_pick_fast_when_queue_deep(make_router):
+    router, _ = make_router()
+    assert router.pick("vet", queue_depth=4) == "small"
+    assert router.snapshot()["decisions"][-1]["reason"].startswith("queue_depth")
+
+def test_pick_fast_over_slo_until_samples_age_out(make_router):
+    router, clock = make_router()
+    for _ in range(5):
+        router.record("vet", "big", 3.0)
+    assert router.pick("vet") == "small"
+    clock.now += 61
+    assert router.pick("vet") == "big"
+
+def test_probe_sends_every_nth_degraded_request_to_large(make_router):
+    router, _ = make_router(probe_every=3)
+    router.record("vet", "big", 3.0)
+    picks = [router.pick("vet") for _ in range(6)]
+    assert picks == ["small", "small", "big", "small", "small", "big"]
+    assert router.snapshot()["decisions"][-1]["reason"].startswith("probe")
+
+def test_snapshot_stats_follow_window(make_router):
+    router, clock = make_router()
+    router.record("vet", "big", 0.5)
+    router.record("vet", "big", 1.5, ok=False)
+    stats = router.snapshot()["latency"]["vet/big"]
+    assert stats["n"] == 2 and stats["errors"] == 1 and stats["p95_s"] == 1.5
+    clock.now += 61
+    assert "vet/big" not in router.snapshot()["latency"]
+
+def test_routers_sharing_a_db_share_samples_and_decisions(make_router):
+    # Stands in for the API process and a --workers-only process
+    api, clock = make_router()
+    worker, _ = make_router(clock=clock)
+    worker.record("vet", "big", 3.0)
+    assert worker.pick("vet") == "small"
+    snap = api.snapshot()
+    assert snap["latency"]["vet/big"]["n"] == 1
+    assert snap["decisions"][-1]["model"] == "small"
+    assert api.pick("vet") == "small"
+
+def test_run_against_stub_llm_degrades_to_fast(stub_llm, monkeypatch, make_router):
+    monkeypatch.setattr(stub_llm, "STUB_LATENCY", {"big": 1.2})     # over the 1s SLO
+    router, _ = make_router()
+    inputs = {"industry": "SaaS / IT", "one_liner": "Invoice reminders for freelancers",
+              "desc": "Chases late invoices by email.", "founder_ctx": "Solo founder"}
+    data, _, model = router.run("vet", inputs)
+    assert model == "big" and data["model"] == "big"
+    assert router.p95("vet", "big") > TABLE["vet"]["slo_s"]
+    data, _, model = router.run("vet", inputs)
+    assert model == "small" and data["model"] == "small"
@@ -0,0 +1,42 @@
+# Tracing tests: span nesting across threads sharing one trace, profiler switch.
+import json, asyncio, threading
+
+import xq_trace
+from xq_trace import start_trace, end_trace, span, set_profiling_enabled, should_profile
+
+def _parents(trace_file) -> dict:
+    spans = json.loads(trace_file.read_text().splitlines()[-1])["spans"]
+    return {s[0]: spans[s[1]][0] if s[1] is not None else None for s in spans}
+
+def test_spans_from_parallel_threads_keep_their_own_parents(monkeypatch, tmp_path):
+    monkeypatch.setattr(xq_trace, "XQ_TRACE_FILE", tmp_path / "traces.jsonl")
+    both_open = threading.Barrier(2, timeout=5)
+
+    def work(name):
+        with span(name):
+            both_open.wait()        # both threads hold an open span before either nests
+            with span(f"{name}.child"):
+                both_open.wait()
+
+    async def job():
+        trace = start_trace("job", force=True)
+        with span("root"):
+            await asyncio.gather(asyncio.to_thread(work, "draft"), asyncio.to_thread(work, "refine"))
+        with span("after"):
+            pass
+        end_trace(trace)
+
+    asyncio.run(job())
+    assert _parents(tmp_path / "traces.jsonl") == {
+        "root": None, "draft": "root", "refine": "root",
+        "draft.child": "draft", "refine.child": "refine", "after": None,
+    }
+
+def test_profiling_every_nth_rerun(monkeypatch):
+    monkeypatch.setattr(xq_trace, "_profile_count", 0)
+    set_profiling_enabled(True, every=3)
+    try:
+        assert [should_profile() for _ in range(6)] == [False, False, True, False, False, True]
+    finally:
+        set_profiling_enabled(False)
+    assert not should_profile()